@@ -6,7 +6,7 @@ protected) and a source folder (the collection to clean).
 
 Deduplication uses a 3-stage tiered pipeline to minimise disk I/O:
   Stage 1 — Size filter  : files with unique sizes cannot be identical (zero I/O)
-  Stage 2 — Partial hash : hash only the first PARTIAL_HASH_SIZE bytes (cheap I/O)
+  Stage 2 — Partial hash : hash only the first and last PARTIAL_HASH_SIZE bytes (cheap I/O)
   Stage 3 — Full hash    : full hash of candidates surviving both prior stages
 
 A source file is flagged as a duplicate when:
@@ -20,31 +20,60 @@ Usage:
 """
 
 import os
+import errno
+import functools
 import hashlib
+import json
 import logging
+import mmap
+import multiprocessing
 import shutil
+import sys
+import threading
 import time
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Optional
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from tqdm import tqdm
+from tqdm.contrib.concurrent import thread_map
 from pathlib import Path
 
+try:
+    import blake3                     # optional: pip install blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash                     # optional: pip install xxhash
+except ImportError:
+    xxhash = None
+
 # ======= DEFAULT CONFIGURATION =======
 # All values below can be overridden via CLI arguments (run with --help).
 REFERENCE_FOLDER   = Path(r"")         # Protected directory (original files)
 SOURCE_FOLDER      = Path(r"")         # Directory to scan for duplicates
 OUTPUT_FOLDER      = Path(r"")         # Where to move duplicate files
 LOG_FILE           = Path("audio_deduplication.log")
+CACHE_FILE         = Path("audio_dedup_cache.json")  # Persistent digest cache
+USE_CACHE          = True              # False = always rehash every candidate
 LOGGING_LEVEL      = "INFO"            # DEBUG | INFO | WARNING | ERROR
-THREADS            = 8                 # Parallel worker count
-HASH_ALGORITHM     = "sha256"          # Hashing algorithm (sha256 recommended)
-PARTIAL_HASH_SIZE  = 4096             # Bytes to read for Stage 2 (4 KB)
+THREADS            = 0                 # Parallel worker count (0 = auto: 1 on HDDs, else min(CPUs, 16))
+MAX_AUTO_THREADS   = 16                # Upper bound for the automatic worker count
+PROCESS_CHUNKSIZE  = 32                # Max files per task batch when hashing with --processes
+PROGRESS_INTERVAL  = 0.5               # Minimum seconds between progress bar redraws
+STREAM_BLOCK_SIZE  = 1 << 20           # Read buffer (1 MB) for Stage 3 full hashes
+USE_MMAP           = False             # True = mmap files for Stage 3 (a file truncated mid-hash kills the run with SIGBUS)
+USE_PROCESSES      = False             # True = hash in worker processes instead of threads
+PIN_CORES          = False             # True = pin hashing threads to distinct physical cores (Linux)
+HASH_ALGORITHM     = "blake3" if blake3 else "sha256"  # blake3 when installed, else sha256
+PARTIAL_HASH_SIZE  = 4096             # Bytes read from each end of the file in Stage 2 (4 KB)
 MAX_HASH_BYTES     = None             # None = full file; int = byte cap for Stage 3
 DRY_RUN            = False            # True = simulate without moving files
 RETRIES            = 3               # Move retry attempts
 RETRY_DELAY        = 1.0             # Initial retry delay in seconds (exponential backoff)
-AUDIO_EXTENSIONS   = {".mp3", ".flac", ".wav", ".aac", ".ogg", ".aif", ".aiff"}
+AUDIO_EXTENSIONS   = frozenset({".mp3", ".flac", ".wav", ".aac", ".ogg", ".aif", ".aiff"})
 # =====================================
 
 logger = logging.getLogger(__name__)
@@ -61,8 +90,17 @@ class UnicodeFormatter(logging.Formatter):
         return super().format(record).encode("utf-8", errors="replace").decode("utf-8")
 
 
-def setup_logging(log_file: Path, level: str) -> None:
-    """Initialise the root logger with console + file handlers."""
+def setup_logging(log_file: Path, level: str) -> QueueListener:
+    """
+    Initialise the root logger with console + file handlers.
+
+    The root logger only gets a QueueHandler; a single QueueListener thread
+    drains the queue into the console and file handlers, so workers never
+    block on handler locks or disk flushes.  The queue is a multiprocessing
+    queue so that hashing processes (--processes) can log into it too; see
+    _init_worker_logging().  Returns the started listener — call stop() on
+    it to flush pending records before exiting.
+    """
     numeric_level = getattr(logging, level.upper(), logging.INFO)
     root = logging.getLogger()
     root.setLevel(numeric_level)
@@ -76,8 +114,28 @@ def setup_logging(log_file: Path, level: str) -> None:
     ch = logging.StreamHandler()
     ch.setFormatter(formatter)
 
-    root.addHandler(fh)
-    root.addHandler(ch)
+    log_queue: "multiprocessing.Queue[logging.LogRecord]" = multiprocessing.Queue()
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, fh, ch)
+    listener.start()
+    return listener
+
+
+def _init_worker_logging(log_queue, level: int) -> None:
+    """Process pool initializer: route the worker's records to the parent's listener."""
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+
+def _worker_logging_args() -> Tuple:
+    """Return (initializer, initargs) that make pool processes log like this one."""
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, QueueHandler):
+            return _init_worker_logging, (handler.queue, root.level)
+    return None, ()
 
 
 # ---------------------------------------------------------------------------
@@ -95,10 +153,15 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--output",            type=Path,  default=OUTPUT_FOLDER,     help="Folder to move duplicates into")
     p.add_argument("--log-file",          type=Path,  default=LOG_FILE,          help="Log file path")
     p.add_argument("--log-level",                     default=LOGGING_LEVEL,     help="Logging verbosity")
-    p.add_argument("--threads",           type=int,   default=THREADS,           help="Parallel worker count")
-    p.add_argument("--hash-algorithm",               default=HASH_ALGORITHM,    help="Hash algorithm (sha256, md5 ...)")
-    p.add_argument("--partial-hash-size", type=int,   default=PARTIAL_HASH_SIZE, help="Bytes for Stage 2 partial hash")
+    p.add_argument("--threads",           type=int,   default=THREADS,           help="Parallel worker count (0 = auto: 1 on rotational disks, else min(CPUs, 16))")
+    p.add_argument("--processes",         action="store_true", default=USE_PROCESSES, help="Hash in worker processes instead of threads (sidesteps the GIL)")
+    p.add_argument("--mmap",              action="store_true", default=USE_MMAP, help="Memory-map files for the Stage 3 hash (faster; a file truncated while hashed crashes the run)")
+    p.add_argument("--pin-cores",         action="store_true", default=PIN_CORES, help="Pin hashing threads to distinct physical cores (Linux; caps workers at the core count; blake3 then hashes each file single-threaded)")
+    p.add_argument("--hash-algorithm",               default=HASH_ALGORITHM,    help="Hash algorithm (blake3, xxh3_128, sha256, md5 ...)")
+    p.add_argument("--partial-hash-size", type=int,   default=PARTIAL_HASH_SIZE, help="Bytes read from each end of the file for the Stage 2 partial hash")
     p.add_argument("--max-hash-bytes",    type=int,   default=MAX_HASH_BYTES,    help="Cap Stage 3 full hash at N bytes (0 = full file)")
+    p.add_argument("--cache-file",        type=Path,  default=CACHE_FILE,        help="Persistent hash cache file")
+    p.add_argument("--no-cache",          action="store_false", dest="use_cache", default=USE_CACHE, help="Disable the persistent hash cache")
     p.add_argument("--dry-run",           action="store_true", default=DRY_RUN,  help="Simulate; do not move files")
     p.add_argument("--retries",           type=int,   default=RETRIES,           help="Move retry attempts")
     p.add_argument("--retry-delay",       type=float, default=RETRY_DELAY,       help="Initial retry delay in seconds")
@@ -106,111 +169,646 @@ def parse_args() -> argparse.Namespace:
 
 
 # ---------------------------------------------------------------------------
-# File utilities
+# Storage detection
 # ---------------------------------------------------------------------------
 
-def get_file_size(file_path: str) -> Optional[int]:
-    """Return file size in bytes, or None on error."""
+def _is_rotational_linux(path: Path) -> Optional[bool]:
+    """Read /sys/dev/block/<major>:<minor>/queue/rotational for *path*'s device."""
+    dev = os.stat(path).st_dev
+    sys_dev = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    # Partitions (sda1) carry no queue/ directory; their parent disk (sda) does.
+    for candidate in (sys_dev, os.path.dirname(sys_dev)):
+        flag = os.path.join(candidate, "queue", "rotational")
+        if os.path.exists(flag):
+            with open(flag, "r") as fh:
+                return fh.read().strip() == "1"
+    return None
+
+
+def _is_rotational_windows(path: Path) -> Optional[bool]:
+    """Query StorageDeviceSeekPenaltyProperty for the volume hosting *path*."""
+    import ctypes
+    from ctypes import wintypes
+
+    IOCTL_STORAGE_QUERY_PROPERTY = 0x002D1400
+    STORAGE_DEVICE_SEEK_PENALTY_PROPERTY = 7
+    PROPERTY_STANDARD_QUERY = 0
+    OPEN_EXISTING = 3
+    FILE_SHARE_READ_WRITE = 0x1 | 0x2
+
+    class STORAGE_PROPERTY_QUERY(ctypes.Structure):
+        _fields_ = [
+            ("PropertyId", wintypes.DWORD),
+            ("QueryType", wintypes.DWORD),
+            ("AdditionalParameters", ctypes.c_ubyte * 1),
+        ]
+
+    class DEVICE_SEEK_PENALTY_DESCRIPTOR(ctypes.Structure):
+        _fields_ = [
+            ("Version", wintypes.DWORD),
+            ("Size", wintypes.DWORD),
+            ("IncursSeekPenalty", wintypes.BOOLEAN),
+        ]
+
+    drive = os.path.splitdrive(os.path.abspath(path))[0]
+    if not drive or drive.startswith("\\\\"):      # UNC share — no local device
+        return None
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    handle = kernel32.CreateFileW(
+        f"\\\\.\\{drive}", 0, FILE_SHARE_READ_WRITE, None, OPEN_EXISTING, 0, None
+    )
+    if handle == wintypes.HANDLE(-1).value:
+        return None
+    handle = wintypes.HANDLE(handle)      # keep the full pointer width in calls below
+    try:
+        query = STORAGE_PROPERTY_QUERY(STORAGE_DEVICE_SEEK_PENALTY_PROPERTY, PROPERTY_STANDARD_QUERY)
+        result = DEVICE_SEEK_PENALTY_DESCRIPTOR()
+        returned = wintypes.DWORD()
+        ok = kernel32.DeviceIoControl(
+            handle, IOCTL_STORAGE_QUERY_PROPERTY,
+            ctypes.byref(query), ctypes.sizeof(query),
+            ctypes.byref(result), ctypes.sizeof(result),
+            ctypes.byref(returned), None,
+        )
+        return bool(result.IncursSeekPenalty) if ok else None
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def is_rotational(path: Path) -> Optional[bool]:
+    """
+    Return True if *path* lives on a rotational disk (HDD), False for
+    SSD/NVMe, or None when the device class cannot be determined (network
+    shares, virtual filesystems, unsupported platforms).
+    """
     try:
-        return os.path.getsize(file_path)
+        if sys.platform.startswith("linux"):
+            return _is_rotational_linux(path)
+        if sys.platform == "win32":
+            return _is_rotational_windows(path)
     except Exception as exc:
-        logger.error("Error getting size of %s: %s", file_path, exc)
-        return None
+        logger.debug("Could not determine storage type of %s: %s", path, exc)
+    return None
+
 
+def resolve_threads(requested: int, paths: List[Path]) -> int:
+    """
+    Return the worker count to use for I/O touching *paths*.
+
+    An explicit *requested* count (> 0) always wins.  Otherwise concurrency is
+    capped at 1 when any path is on a rotational disk — parallel reads make an
+    HDD seek between files and collapse throughput — and set to
+    min(CPU count, MAX_AUTO_THREADS) for solid-state or unknown storage.
+    """
+    if requested > 0:
+        return requested
+    if any(is_rotational(p) for p in paths):
+        return 1
+    return min(os.cpu_count() or 1, MAX_AUTO_THREADS)
+
+
+# ---------------------------------------------------------------------------
+# CPU pinning
+# ---------------------------------------------------------------------------
+
+def physical_core_cpus() -> List[int]:
+    """
+    Return one logical CPU id per physical core available to this process.
+
+    SMT siblings are collapsed using each CPU's sysfs thread_siblings_list,
+    keeping the lowest-numbered sibling.  Linux only: returns [] on other
+    platforms or when the topology cannot be read.
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return []
+    first_sibling: Dict[str, int] = {}
+    for cpu in sorted(os.sched_getaffinity(0)):
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        try:
+            with open(path, "r") as fh:
+                siblings = fh.read().strip()
+        except OSError:
+            return []
+        first_sibling.setdefault(siblings, cpu)
+    return sorted(first_sibling.values())
+
+
+_pin_state = threading.local()
+_pin_lock = threading.Lock()
+_pin_next = 0
+
+
+def _pin_current_thread(cpus: Tuple[int, ...]) -> None:
+    """
+    Pin the calling worker thread to the next CPU in *cpus*, once per thread.
 
-def compute_hash(file_path: str, algorithm: str, max_bytes: Optional[int]) -> Optional[str]:
+    Pool initializers are taken by tqdm's thread_map, so workers pin
+    themselves lazily on their first task.  On Linux sched_setaffinity(0, ...)
+    affects only the calling thread.
     """
-    Hash *file_path* with *algorithm*.
+    global _pin_next
+    if getattr(_pin_state, "pinned", False):
+        return
+    _pin_state.pinned = True
+    with _pin_lock:
+        cpu = cpus[_pin_next % len(cpus)]
+        _pin_next += 1
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except OSError as exc:
+        logger.debug("Could not pin worker thread to CPU %d: %s", cpu, exc)
+
+
+def _pinned_call(cpus: Tuple[int, ...], func, *args):
+    """Run *func* (*args*) after pinning the current worker thread."""
+    _pin_current_thread(cpus)
+    return func(*args)
+
+
+# ---------------------------------------------------------------------------
+# File utilities
+# ---------------------------------------------------------------------------
+
+XXHASH_ALGORITHMS = {"xxh32", "xxh64", "xxh3_64", "xxh3_128", "xxh128"}
+
+
+def new_hasher(algorithm: str):
+    """
+    Return a fresh hasher for *algorithm* exposing update() / digest().
+
+    ``blake3`` and the ``xxh*`` family are served by their optional packages
+    (BLAKE3 uses its SIMD, multi-threaded tree mode); anything else is passed
+    to hashlib.new().  Raises ValueError for unknown or unavailable algorithms.
+
+    On a worker thread pinned by --pin-cores BLAKE3 stays single-threaded:
+    its shared thread pool is created lazily by the first caller and would
+    inherit that thread's one-CPU affinity mask.
+    """
+    name = algorithm.lower()
+    if name == "blake3":
+        if blake3 is None:
+            raise ValueError("blake3 is not installed (pip install blake3)")
+        pinned = getattr(_pin_state, "pinned", False)
+        return blake3.blake3(max_threads=1 if pinned else blake3.blake3.AUTO)
+    if name in XXHASH_ALGORITHMS:
+        if xxhash is None:
+            raise ValueError(f"{name} requires xxhash (pip install xxhash)")
+        return getattr(xxhash, name)()
+    return hashlib.new(algorithm)
+
+
+def _fadvise(fd: int, offset: int, length: int, advice_name: str) -> None:
+    """Best-effort os.posix_fadvise(); a no-op where unsupported (e.g. Windows)."""
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def _hash_stream(fh, hasher, length: int) -> None:
+    """
+    Feed the next *length* bytes of *fh* to *hasher* with readinto().
+
+    The default read path for compute_hash().  A single buffer is reused
+    through a memoryview, so no bytes object is allocated per block and large
+    blocks keep the number of Python-level iterations low.  A file that
+    shrinks while it is read just ends early (its digest is then stale, not
+    fatal).
+    """
+    view = memoryview(bytearray(min(length, STREAM_BLOCK_SIZE)))
+    remaining = length
+    while remaining:
+        n = fh.readinto(view[:remaining] if remaining < len(view) else view)
+        if not n:
+            break
+        hasher.update(view[:n])
+        remaining -= n
+
+
+def digest_to_int(hasher) -> int:
+    """
+    Return *hasher*'s digest as a Python int.
+
+    Ints are smaller than hex strings and cheaper to hash and compare as dict
+    keys; format with f"{digest:x}" where a printable form is needed.
+    """
+    return int.from_bytes(hasher.digest(), "big")
+
+
+def compute_hash(
+    file_path: str, algorithm: str, max_bytes: Optional[int], use_mmap: bool = False
+) -> Optional[int]:
+    """
+    Hash *file_path* with *algorithm* and return the digest as an int.
 
     When *max_bytes* is None or 0 the entire file is read.
     When *max_bytes* > 0 only the first *max_bytes* bytes are read.
-    I/O is performed in 64 KB blocks regardless.
+    The range is read with _hash_stream().  With *use_mmap* it is instead
+    memory-mapped and passed to the hasher in a single update() call, which
+    saves the read() syscalls — but if the file is truncated while mapped,
+    touching the missing pages raises SIGBUS and the whole process dies.
+    Filesystems that refuse mmap, and ranges too large for the address space
+    (32-bit builds), still go through _hash_stream().
+
+    The kernel is told the range will be read sequentially (more aggressive
+    read-ahead) and, once hashed, that its pages are no longer needed, so a
+    scan of thousands of files does not evict the rest of the page cache.
     """
-    BLOCK = 65536
     try:
-        hasher = hashlib.new(algorithm)
-        bytes_read = 0
+        hasher = new_hasher(algorithm)
         with open(file_path, "rb") as fh:
-            while True:
-                if max_bytes:
-                    remaining = max_bytes - bytes_read
-                    if remaining <= 0:
-                        break
-                    to_read = min(BLOCK, remaining)
-                else:
-                    to_read = BLOCK
-                chunk = fh.read(to_read)
-                if not chunk:
-                    break
-                hasher.update(chunk)
-                bytes_read += len(chunk)
-        return hasher.hexdigest()
+            size = os.fstat(fh.fileno()).st_size
+            length = min(size, max_bytes) if max_bytes else size
+            _fadvise(fh.fileno(), 0, length, "POSIX_FADV_SEQUENTIAL")
+            mm = None
+            if use_mmap and length:             # mmap rejects empty mappings
+                try:
+                    mm = mmap.mmap(fh.fileno(), length, access=mmap.ACCESS_READ)
+                except (OSError, ValueError, OverflowError):
+                    pass
+            if mm is None:
+                _hash_stream(fh, hasher, length)
+            else:
+                with mm:
+                    if hasattr(mm, "madvise"):  # Python 3.8+, Unix only
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                        mm.madvise(mmap.MADV_WILLNEED)
+                    hasher.update(mm)
+            _fadvise(fh.fileno(), 0, 0, "POSIX_FADV_DONTNEED")
+        return digest_to_int(hasher)
     except Exception as exc:
         logger.error("Error hashing %s: %s", file_path, exc)
         return None
 
 
-def find_audio_files(root_dir: Path) -> List[str]:
-    """Recursively collect audio files under *root_dir*."""
-    results: List[str] = []
-    all_paths = list(root_dir.rglob("*"))
-    for path in tqdm(all_paths, desc=f"Scanning {root_dir.name}", unit="file"):
-        if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS:
-            results.append(str(path))
-    logger.info("Found %d audio files in %s", len(results), root_dir)
-    return results
+def compute_partial_hash(file_path: str, algorithm: str, window: int) -> Optional[int]:
+    """
+    Hash the first and last *window* bytes of *file_path* with *algorithm*.
+
+    Files no larger than 2 × *window* are hashed whole.  Sampling the tail as
+    well as the head separates files that share a header (identical encoder
+    preamble or tags) but differ in audio data or trailing ID3v1/APE tags.
+    """
+    try:
+        hasher = new_hasher(algorithm)
+        with open(file_path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size <= 2 * window:
+                hasher.update(fh.read())
+            else:
+                hasher.update(fh.read(window))
+                fh.seek(size - window)
+                hasher.update(fh.read(window))
+        return digest_to_int(hasher)
+    except Exception as exc:
+        logger.error("Error hashing %s: %s", file_path, exc)
+        return None
+
+
+def _file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """Return (size, mtime_ns) for *file_path*, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class HashCache:
+    """
+    Disk-backed digest cache persisted as JSON between runs.
+
+    Entries are keyed by (algorithm, hash mode, absolute path) and store the
+    (size, mtime_ns) signature observed *before* hashing.  A lookup only hits
+    when the file's current signature still matches, so modified files are
+    rehashed transparently.  The cache is only touched from the main thread.
+
+    On save, entries that were neither looked up nor written this run are
+    kept only while their file still exists, so deleted and renamed files do
+    not accumulate in the cache forever.
+    """
+
+    VERSION = 3
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._entries: Dict[str, list] = {}
+        self._touched: Set[str] = set()
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def key(
+        file_path: str, algorithm: str, max_bytes: Optional[int], partial: bool = False
+    ) -> str:
+        mode = f"partial{max_bytes}" if partial else f"full{max_bytes or 0}"
+        return f"{algorithm}:{mode}:{os.path.abspath(file_path)}"
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable hash cache %s: %s", self.path, exc)
+            return
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            logger.info("Hash cache %s has an outdated format — starting fresh.", self.path)
+            return
+        entries = data.get("entries")
+        if not isinstance(entries, dict) or not all(
+            key.count(":") >= 2 and isinstance(entry, list) and len(entry) == 3
+            for key, entry in entries.items()
+        ):
+            logger.warning("Ignoring malformed hash cache %s — starting fresh.", self.path)
+            return
+        self._entries = entries
+        logger.info("Loaded %d cached digest(s) from %s", len(self._entries), self.path)
+
+    def get(self, key: str, signature: Tuple[int, int]) -> Optional[int]:
+        """Return the cached digest for *key* if *signature* still matches."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature[0] and entry[1] == signature[1]:
+            self._touched.add(key)
+            return entry[2]
+        return None
+
+    def put(self, key: str, signature: Tuple[int, int], digest: int) -> None:
+        self._entries[key] = [signature[0], signature[1], digest]
+        self._touched.add(key)
+        self._dirty = True
+
+    def _prune(self) -> None:
+        """Drop untouched entries whose file no longer exists."""
+        stale = [
+            key for key in self._entries
+            if key not in self._touched and not os.path.exists(key.split(":", 2)[2])
+        ]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self._dirty = True
+            logger.debug("Evicted %d stale cache entries", len(stale))
+
+    def save(self) -> None:
+        """Prune stale entries, then write the cache atomically (temp file + rename)."""
+        self._prune()
+        if not self._dirty:
+            return
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"version": self.VERSION, "entries": self._entries}, fh)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            logger.info("Saved %d cached digest(s) to %s", len(self._entries), self.path)
+        except OSError as exc:
+            logger.error("Error saving hash cache %s: %s", self.path, exc)
+
+
+def iter_audio_files(root_dir: Path, recursive: bool = True) -> Iterator[os.DirEntry]:
+    """
+    Lazily yield a DirEntry for every audio file under *root_dir*.
+
+    Walks with os.scandir and an explicit stack, so the tree is never
+    materialised in memory and deep hierarchies cannot hit the recursion
+    limit.  Directory symlinks are not followed (as with Path.rglob), which
+    rules out cycles.  Unreadable directories are logged and skipped.
+    With *recursive* False only files directly inside *root_dir* are yielded.
+    """
+    stack = [str(root_dir)]
+    while stack:
+        directory = stack.pop()
+        subdirs: List[str] = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        name = entry.name
+                        dot = name.rfind(".")
+                        # dot > 0 mirrors Path.suffix: ".mp3" alone is a stem, not a suffix.
+                        if dot > 0 and name[dot:].lower() in AUDIO_EXTENSIONS and entry.is_file():
+                            yield entry
+                    except OSError as exc:
+                        logger.error("Error reading %s: %s", entry.path, exc)
+        except OSError as exc:
+            logger.error("Error scanning %s: %s", directory, exc)
+        if recursive:
+            stack.extend(reversed(subdirs))   # visit subdirectories in scandir order
+
+
+def _scan_subtree(
+    root_dir: str, recursive: bool, progress: tqdm
+) -> Iterator[Tuple[str, int, int]]:
+    """Yield (path, size, mtime_ns) under *root_dir*, ticking *progress* per file."""
+    for entry in iter_audio_files(Path(root_dir), recursive):
+        try:
+            st = entry.stat()
+        except OSError as exc:
+            logger.error("Error getting size of %s: %s", entry.path, exc)
+            continue
+        progress.update(1)
+        yield entry.path, st.st_size, st.st_mtime_ns
+
+
+def scan_audio_files(root_dir: Path, threads: int = 1) -> Iterator[Tuple[str, int, int]]:
+    """
+    Lazily yield (path, size, mtime_ns) for every audio file under *root_dir*.
+
+    Sizes and mtimes come from the DirEntry's cached stat(), so neither Stage 1
+    nor the hash cache's signature check needs further metadata calls.  With *threads* > 1 every top-level subdirectory is walked
+    in its own thread: on high-latency storage (SMB/NFS, AV-scanned NTFS) a
+    walk is bound by per-call round-trips, which threads overlap.  Results are
+    yielded in scandir order, so the output order is the same as for a
+    sequential walk.
+
+    Being a generator, the scan can feed find_duplicates() directly.  A
+    sequential walk (*threads* <= 1, or fewer than two subdirectories) holds
+    no results at all; a parallel walk buffers each subtree's results as a
+    list until that subtree's turn comes, so peak memory is bounded by the
+    subtrees scanned ahead of the consumer, not by one entry.
+    """
+    logger.info("Scanning %s ...", root_dir)
+    subdirs: List[str] = []
+    if threads > 1:
+        try:
+            with os.scandir(root_dir) as it:
+                subdirs = [e.path for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError as exc:
+            logger.error("Error scanning %s: %s", root_dir, exc)
+
+    found = 0
+    with tqdm(desc=f"Scanning {root_dir.name}", unit="file") as progress:
+        if len(subdirs) < 2:
+            for item in _scan_subtree(str(root_dir), True, progress):
+                found += 1
+                yield item
+        else:
+            # Files directly in root_dir first, then one task per subtree.
+            roots = [(str(root_dir), False)] + [(d, True) for d in subdirs]
+            with ThreadPoolExecutor(max_workers=min(threads, len(subdirs))) as executor:
+                for chunk in executor.map(
+                    lambda root: list(_scan_subtree(root[0], root[1], progress)), roots
+                ):
+                    found += len(chunk)
+                    yield from chunk
+
+    logger.info("Found %d audio files in %s", found, root_dir)
+
+
+def find_audio_files(root_dir: Path, threads: int = 1) -> List[Tuple[str, int, int]]:
+    """Recursively collect audio files under *root_dir* as a list of (path, size, mtime_ns)."""
+    return list(scan_audio_files(root_dir, threads))
 
 
 # ---------------------------------------------------------------------------
 # Core deduplication — 3-stage tiered pipeline
 # ---------------------------------------------------------------------------
 
+def process_chunksize(n_files: int, workers: int) -> int:
+    """
+    Return the executor.map() chunksize for hashing *n_files* in *workers* processes.
+
+    Process pools hand results back a whole chunk at a time, so the progress
+    bar can only advance in chunk-sized steps.  Batches are sized for roughly
+    eight steps per worker, capped at PROCESS_CHUNKSIZE, which keeps IPC
+    overhead low on large runs without freezing the bar on small ones.
+    """
+    return max(1, min(PROCESS_CHUNKSIZE, n_files // (max(workers, 1) * 8)))
+
+
 def _hash_pool(
     files: List[str],
     algorithm: str,
     max_bytes: Optional[int],
     threads: int,
     desc: str,
-) -> Dict[str, str]:
-    """Hash *files* in parallel; return {path: hexdigest} for successful hashes."""
-    results: Dict[str, str] = {}
-    with ThreadPoolExecutor(max_workers=threads) as executor:
-        future_to_path = {
-            executor.submit(compute_hash, f, algorithm, max_bytes): f for f in files
-        }
-        for future in tqdm(
-            as_completed(future_to_path),
-            total=len(future_to_path),
-            desc=desc,
-            unit="file",
-        ):
-            path = future_to_path[future]
-            digest = future.result()
+    cache: Optional[HashCache] = None,
+    partial: bool = False,
+    use_processes: bool = False,
+    pin_cpus: Tuple[int, ...] = (),
+    use_mmap: bool = False,
+    signatures: Optional[Dict[str, Tuple[int, int]]] = None,
+) -> Dict[str, int]:
+    """
+    Hash *files* in parallel; return {path: digest} for successful hashes.
+
+    With *partial* set, files are hashed with compute_partial_hash() using
+    *max_bytes* as the head/tail window; otherwise compute_hash() is used.
+    *use_processes* swaps the thread pool for a process pool; hashlib and
+    blake3 release the GIL while hashing, so threads are usually sufficient.
+    *pin_cpus*, if given, pins each worker thread to one of those CPUs; it is
+    ignored for process pools.  *use_mmap* is passed on to compute_hash().
+
+    Files with a valid *cache* entry are not read at all.  Cache entries are
+    validated against *signatures* ({path: (size, mtime_ns)} from the scan)
+    when given, so no file is stat'ed again; otherwise each file is stat'ed
+    here.  The returned dict
+    preserves the order of *files* so that "keep the first occurrence" is
+    deterministic regardless of which worker finishes first.
+    """
+    digests: Dict[str, int] = {}
+    pending: Dict[str, Tuple[int, int]] = {}
+    for f in files:
+        signature = None
+        if cache is not None:
+            signature = signatures[f] if signatures is not None else _file_signature(f)
+        if signature is not None:
+            cached = cache.get(HashCache.key(f, algorithm, max_bytes, partial), signature)
+            if cached is not None:
+                digests[f] = cached
+                continue
+        pending[f] = signature
+
+    if cache is not None:
+        logger.info("%s — %d cache hit(s), %d file(s) to hash", desc, len(digests), len(pending))
+
+    if pending:
+        hash_func = compute_partial_hash if partial else compute_hash
+        if use_mmap and not partial:
+            hash_func = functools.partial(compute_hash, use_mmap=True)
+        if pin_cpus and not use_processes:
+            hash_func = functools.partial(_pinned_call, pin_cpus, hash_func)
+        paths = list(pending)
+        # Results come back in submission order; the bar redraws at most
+        # every PROGRESS_INTERVAL seconds instead of once per file.
+        if use_processes:
+            initializer, initargs = _worker_logging_args()
+            with ProcessPoolExecutor(
+                max_workers=threads, initializer=initializer, initargs=initargs
+            ) as executor:
+                results = list(tqdm(
+                    executor.map(
+                        hash_func, paths, repeat(algorithm), repeat(max_bytes),
+                        chunksize=process_chunksize(len(paths), threads),
+                    ),
+                    total=len(paths), desc=desc, unit="file", mininterval=PROGRESS_INTERVAL,
+                ))
+        else:
+            results = thread_map(
+                hash_func, paths, repeat(algorithm), repeat(max_bytes),
+                max_workers=threads,
+                desc=desc, unit="file", mininterval=PROGRESS_INTERVAL,
+            )
+        for path, digest in zip(paths, results):
             if digest is not None:
-                results[path] = digest
-    return results
+                digests[path] = digest
+                signature = pending[path]
+                if cache is not None and signature is not None:
+                    cache.put(HashCache.key(path, algorithm, max_bytes, partial), signature, digest)
+
+    return {f: digests[f] for f in files if f in digests}
 
 
 def find_duplicates(
-    reference_files: List[str],
-    source_files: List[str],
+    reference_files: Iterable[Tuple[str, int, int]],
+    source_files: Iterable[Tuple[str, int, int]],
     algorithm: str,
     partial_hash_size: int,
     max_hash_bytes: Optional[int],
     threads: int,
+    cache: Optional[HashCache] = None,
+    use_processes: bool = False,
+    pin_cpus: Tuple[int, ...] = (),
+    use_mmap: bool = False,
 ) -> List[str]:
     """
     3-stage tiered deduplication across a reference set and a source set.
 
+    Both sets are iterables of (path, size, mtime_ns), e.g. scan_audio_files()
+    generators.  Each is consumed exactly once, reference first, straight into
+    the Stage 1 size index, so no combined file list is ever materialised.  If
+    either set turns out to be empty there is nothing to compare and [] is
+    returned.
+
     Stage 1 — Size filter  : pool both sets together; any file whose size is
                              unique across the entire combined pool cannot be a
-                             duplicate and is eliminated (zero disk I/O).
-    Stage 2 — Partial hash : hash the first *partial_hash_size* bytes of every
-                             Stage-1 survivor; eliminate files whose partial hash
-                             is unique (cheap I/O).
+                             duplicate and is eliminated (zero disk I/O).  Size
+                             groups made up only of reference files are dropped
+                             too: reference files are never moved, so hashing
+                             them could not produce a result.
+    Stage 2 — Partial hash : hash the first and last *partial_hash_size* bytes
+                             of every Stage-1 survivor; eliminate files whose
+                             (size, partial hash) pair is unique, or shared
+                             only by reference files (cheap I/O).
     Stage 3 — Full hash    : fully hash every Stage-2 survivor; determine actual
                              duplicates by comparing final digests.
 
+    When *cache* is given, digests from previous runs are reused for files whose
+    size and mtime are unchanged, so repeat scans skip the hashing I/O.
+    *use_processes* runs the hashing stages in a process pool; *pin_cpus*
+    pins thread-pool workers to distinct physical cores; *use_mmap* maps
+    files for the Stage 3 hash (see compute_hash()).
+
     NOTE — pooling both folders in Stage 1 is intentional and critical:
     if the folders were processed separately, a reference file that happens to be
     the only file of its size in the reference folder would never be hashed and
@@ -218,47 +816,97 @@ def find_duplicates(
 
     Returns a list of *source* file paths that should be moved.
     """
-    reference_set = set(reference_files)
-    # Reference files first so that in internal-source-duplicate groups the
-    # reference path sorts to the front (though we filter by reference_set, not index).
-    all_files = reference_files + source_files
-
     # ── Stage 1: size filter ─────────────────────────────────────────────────
-    logger.info("Stage 1 — size filter across %d combined files ...", len(all_files))
+    # Reference files go in first, so each size group is [reference..., source...]
+    # and a per-size reference count is enough to tell the two apart — no set of
+    # every reference path is kept.
+    # With a cache, the scan's mtimes are kept alongside (same index per size)
+    # so cache lookups need no second stat() of every candidate.
     size_map: Dict[int, List[str]] = {}
-    for f in tqdm(all_files, desc="Stage 1: size filter", unit="file"):
-        size = get_file_size(f)
-        if size is not None:
-            size_map.setdefault(size, []).append(f)
+    mtime_map: Optional[Dict[int, List[int]]] = {} if cache is not None else None
+    reference_counts: Dict[int, int] = {}
+    reference_count = 0
+    source_count = 0
+    for is_source, files in ((False, reference_files), (True, source_files)):
+        for path, size, mtime_ns in files:
+            size_map.setdefault(size, []).append(path)
+            if mtime_map is not None:
+                mtime_map.setdefault(size, []).append(mtime_ns)
+            if is_source:
+                source_count += 1
+            else:
+                reference_counts[size] = reference_counts.get(size, 0) + 1
+                reference_count += 1
+
+    if not reference_count:
+        logger.warning("Reference folder contains no audio files — nothing to compare against.")
+        return []
+    if not source_count:
+        logger.warning("Source folder contains no audio files.")
+        return []
 
-    stage1_candidates = [
-        f for group in size_map.values() if len(group) > 1 for f in group
-    ]
+    total_files = reference_count + source_count
+    logger.info(
+        "Stage 1 — size filter across %d combined files (%d reference, %d source) ...",
+        total_files, reference_count, source_count,
+    )
+
+    stage1_candidates: List[str] = []
+    signatures: Optional[Dict[str, Tuple[int, int]]] = {} if mtime_map is not None else None
+    for size, group in size_map.items():
+        n_ref = reference_counts.get(size, 0)
+        if signatures is not None and len(group) > 1 and len(group) > n_ref:
+            signatures.update(
+                (path, (size, mtime_ns)) for path, mtime_ns in zip(group, mtime_map[size])
+            )
+        if n_ref and len(group) > n_ref:
+            # A file scanned from both sides (reference folder inside the source
+            # folder) keeps only its reference entry: it must never be moved.
+            references = set(group[:n_ref])
+            if not references.isdisjoint(group[n_ref:]):
+                group[n_ref:] = [p for p in group[n_ref:] if p not in references]
+        if len(group) > 1 and len(group) > n_ref:
+            stage1_candidates.extend(group)
+    del mtime_map
     logger.info(
-        "Stage 1 — %d / %d files survive (size collision across both folders)",
+        "Stage 1 — %d / %d files survive (size collision involving a source file)",
         len(stage1_candidates),
-        len(all_files),
+        total_files,
     )
     if not stage1_candidates:
         logger.info("No candidates after Stage 1 — no duplicates.")
         return []
 
     # ── Stage 2: partial hash ────────────────────────────────────────────────
-    logger.info("Stage 2 — partial hash (first %d bytes) ...", partial_hash_size)
+    logger.info("Stage 2 — partial hash (first + last %d bytes) ...", partial_hash_size)
     partial_digests = _hash_pool(
         stage1_candidates, algorithm, partial_hash_size, threads,
-        "Stage 2: partial hash",
+        "Stage 2: partial hash", cache, partial=True, use_processes=use_processes,
+        pin_cpus=pin_cpus, signatures=signatures,
     )
 
-    partial_map: Dict[str, List[str]] = {}
-    for path, digest in partial_digests.items():
-        partial_map.setdefault(digest, []).append(path)
-
-    stage2_candidates = [
-        f for group in partial_map.values() if len(group) > 1 for f in group
+    # Key on size as well: equal head/tail windows only matter within a size group.
+    # Each entry carries its origin from Stage 1 (index >= the group's reference
+    # count means source).  The path alone cannot tell: when the reference folder
+    # sits inside the source folder, one file is scanned as both.
+    partial_map: Dict[Tuple[int, int], List[Tuple[str, bool]]] = {}
+    for size, group in size_map.items():
+        n_ref = reference_counts.get(size, 0)
+        for i, path in enumerate(group):
+            digest = partial_digests.get(path)
+            if digest is not None:
+                partial_map.setdefault((size, digest), []).append((path, i >= n_ref))
+
+    # Same rule as Stage 1: a group needs a source file to yield a move.
+    stage2_entries = [
+        entry
+        for group in partial_map.values()
+        if len(group) > 1 and any(is_source for _, is_source in group)
+        for entry in group
     ]
+    stage2_candidates = [path for path, _ in stage2_entries]
     logger.info(
-        "Stage 2 — %d / %d files survive (partial hash collision)",
+        "Stage 2 — %d / %d files survive (partial hash collision involving a source file)",
         len(stage2_candidates),
         len(stage1_candidates),
     )
@@ -266,34 +914,44 @@ def find_duplicates(
         logger.info("No candidates after Stage 2 — no duplicates.")
         return []
 
+    # Release the Stage 1/2 indexes before the long Stage 3 pass.
+    del size_map, reference_counts, stage1_candidates, partial_digests, partial_map
+
     # ── Stage 3: full hash ───────────────────────────────────────────────────
     logger.info("Stage 3 — full hash of %d candidates ...", len(stage2_candidates))
     full_digests = _hash_pool(
         stage2_candidates, algorithm, max_hash_bytes, threads,
-        "Stage 3: full hash",
+        "Stage 3: full hash", cache, use_processes=use_processes, pin_cpus=pin_cpus,
+        use_mmap=use_mmap, signatures=signatures,
     )
 
-    full_map: Dict[str, List[str]] = {}
-    for path, digest in full_digests.items():
-        full_map.setdefault(digest, []).append(path)
+    # Reference files only matter through their digests, so they collapse into
+    # a set; only source files keep their paths.
+    reference_digests: Set[int] = set()
+    source_map: Dict[int, List[str]] = {}
+    for path, is_source in stage2_entries:
+        digest = full_digests.get(path)
+        if digest is None:
+            continue
+        if is_source:
+            source_map.setdefault(digest, []).append(path)
+        else:
+            reference_digests.add(digest)
 
     # ── Duplicate identification ─────────────────────────────────────────────
-    duplicates: List[str] = []
-    for digest, paths in full_map.items():
-        if len(paths) < 2:
-            continue  # unique full hash — definitely not a duplicate
-
-        ref_paths = [p for p in paths if p in reference_set]
-        src_paths = [p for p in paths if p not in reference_set]
-
-        if ref_paths:
+    duplicate_groups: List[List[str]] = []
+    for digest, paths in source_map.items():
+        if digest in reference_digests:
             # Every source copy is a duplicate of at least one reference file.
-            duplicates.extend(src_paths)
-        elif len(src_paths) > 1:
+            duplicate_groups.append(paths)
+            logger.debug("Duplicate group %x: %s", digest, paths)
+        elif len(paths) > 1:
             # Internal source duplicates with no reference match.
             # Keep the first occurrence; move all subsequent copies.
-            duplicates.extend(src_paths[1:])
+            duplicate_groups.append(paths[1:])
+            logger.debug("Duplicate group %x: %s", digest, paths)
 
+    duplicates = list(chain.from_iterable(duplicate_groups))
     logger.info("Identified %d duplicate file(s).", len(duplicates))
     return duplicates
 
@@ -302,51 +960,117 @@ def find_duplicates(
 # File moving
 # ---------------------------------------------------------------------------
 
+def _candidate_name(dest_path: Path, counter: int) -> Path:
+    """Return *dest_path* for counter 0, else name_<counter>.ext."""
+    if counter == 0:
+        return dest_path
+    return dest_path.with_name(f"{dest_path.stem}_{counter}{dest_path.suffix}")
+
+
+def _reserve_destination(
+    dest_path: Path, hints: Optional[Dict[str, int]] = None
+) -> Tuple[Path, int]:
+    """
+    Atomically claim a free filename for *dest_path*; return it and its counter.
+
+    Each candidate is created as an empty placeholder with O_CREAT | O_EXCL,
+    so concurrent workers moving files that share a basename can never pick
+    the same target.  *hints* maps each destination to the next counter to
+    try, so within one batch k same-named files cost O(k) opens in total, not
+    O(k²).  A hint only skips probes; O_EXCL is what guarantees uniqueness.
+    """
+    key = str(dest_path)
+    counter = hints.get(key, 0) if hints is not None else 0
+    while True:
+        candidate = _candidate_name(dest_path, counter)
+        try:
+            fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            counter += 1
+            continue
+        os.close(fd)
+        if hints is not None:
+            hints[key] = counter + 1
+        return candidate, counter
+
+
+@functools.lru_cache(maxsize=None)
+def _same_filesystem(source_dir: str, destination_dir: str) -> bool:
+    """Return True if both directories share a device; cached per directory pair."""
+    try:
+        return os.stat(source_dir).st_dev == os.stat(destination_dir).st_dev
+    except OSError:
+        return False
+
+
+def _copy_then_delete(source_path: Path, dest_path: Path) -> None:
+    """
+    Move across filesystems without trying rename() first.
+
+    shutil.move() always attempts os.rename() and only copies once that fails;
+    copying directly skips the doomed syscall.  The source is only removed
+    after the copy (data and metadata) has completed.
+    """
+    shutil.copy2(source_path, dest_path)
+    os.unlink(source_path)
+
+
 def move_file(
     source: str,
     destination_folder: Path,
     dry_run: bool,
     retries: int,
     retry_delay: float,
+    hints: Optional[Dict[str, int]] = None,
 ) -> None:
     """
     Move *source* into *destination_folder*.
 
-    - Generates a unique filename when a name collision exists in the destination.
-    - Tries a fast same-filesystem rename first; falls back to shutil.move for
-      cross-filesystem operations (catches the OSError errno EXDEV).
-    - Both rename and shutil.move failures are retried up to *retries* times
-      with exponential backoff.  The outer for-loop ensures shutil.move failures
-      are retried too (original code bypassed retries for the shutil path).
+    - Generates a unique filename when a name collision exists in the destination,
+      reserving it atomically (see _reserve_destination) so parallel moves
+      cannot overwrite each other; the reserved placeholder is then replaced.
+      *hints* is the batch's collision-counter map; a released placeholder
+      rolls its name's hint back so the name can be reused.
+    - Decides once per (source dir, destination dir) pair whether the move can
+      be an atomic rename or must copy and delete (_copy_then_delete), so
+      cross-filesystem moves never pay for a doomed rename() first.  A rename
+      that still fails with EXDEV (e.g. bind mounts of one device) falls back
+      to the copy.
+    - Failures are retried up to *retries* times with exponential backoff.
     """
     source_path = Path(source)
     dest_path = destination_folder / source_path.name
 
-    # Resolve filename collision before touching the filesystem.
-    counter = 1
-    while dest_path.exists():
-        dest_path = dest_path.with_name(
-            f"{source_path.stem}_{counter}{source_path.suffix}"
-        )
-        counter += 1
-
     if dry_run:
-        logger.info("[Dry Run] Would move: %s -> %s", source, dest_path)
+        # Report the name a real run would pick, without creating placeholders.
+        counter = 0
+        while _candidate_name(dest_path, counter).exists():
+            counter += 1
+        logger.info("[Dry Run] Would move: %s -> %s", source, _candidate_name(dest_path, counter))
         return
 
     dest_path.parent.mkdir(parents=True, exist_ok=True)
+    hint_key = str(dest_path)
+    dest_path, counter = _reserve_destination(dest_path, hints)
+
+    same_fs = _same_filesystem(str(source_path.parent), str(dest_path.parent))
 
     last_error: Optional[Exception] = None
     for attempt in range(retries + 1):          # attempt 0 = first try, 1..retries = retries
         try:
-            try:
-                source_path.rename(dest_path)   # fast path: same filesystem (atomic)
-            except OSError:
-                # Fallback for cross-filesystem moves (errno EXDEV and similar).
-                shutil.move(str(source_path), str(dest_path))
+            if same_fs:
+                try:
+                    os.replace(source_path, dest_path)  # atomic, overwrites placeholder
+                except OSError as exc:
+                    if exc.errno != errno.EXDEV:
+                        raise
+                    same_fs = False
+                    _copy_then_delete(source_path, dest_path)
+            else:
+                _copy_then_delete(source_path, dest_path)
             logger.info("Moved: %s -> %s", source, dest_path)
             return                              # success — stop immediately
-        except Exception as exc:
+        except OSError as exc:
             last_error = exc
             if attempt < retries:
                 delay = retry_delay * (2 ** attempt)
@@ -358,6 +1082,21 @@ def move_file(
             # If attempt == retries: loop ends naturally, error logged below.
 
     logger.error("Failed to move %s after %d retries: %s", source, retries, last_error)
+    try:
+        if source_path.exists():
+            dest_path.unlink()                  # release the placeholder or partial copy
+            if hints is not None:
+                hints[hint_key] = min(hints.get(hint_key, 0), counter)
+    except OSError:
+        pass
+
+
+def _device_id(directory: str) -> int:
+    """Return the st_dev of *directory*, or -1 if it cannot be stat'ed."""
+    try:
+        return os.stat(directory).st_dev
+    except OSError:
+        return -1
 
 
 def move_files_in_parallel(
@@ -368,24 +1107,44 @@ def move_files_in_parallel(
     retry_delay: float,
     threads: int,
 ) -> None:
-    """Move *files* to *destination_folder* in parallel with progress tracking."""
-    with ThreadPoolExecutor(max_workers=threads) as executor:
-        future_to_path = {
-            executor.submit(
-                move_file, f, destination_folder, dry_run, retries, retry_delay
-            ): f
-            for f in files
-        }
-        for future in tqdm(
-            as_completed(future_to_path),
-            total=len(future_to_path),
-            desc="Moving duplicates",
-            unit="file",
-        ):
-            try:
-                future.result()
-            except Exception as exc:
-                logger.error("Move task raised unhandled exception: %s", exc)
+    """
+    Move *files* to *destination_folder* in parallel with progress tracking.
+
+    Files are partitioned by the filesystem they currently live on and each
+    partition is moved with its own pool, one after another.  When *threads*
+    is 0 (auto) a partition's worker count comes from resolve_threads() over
+    its source directory and the destination, so a partition on (or moving
+    to) an HDD runs serially without throttling SSD-backed partitions.
+    Collision-counter hints are shared by this batch only.
+    """
+    hints: Dict[str, int] = {}
+
+    def _move(source: str) -> None:
+        # Contain failures so one bad file cannot abort the remaining moves.
+        try:
+            move_file(source, destination_folder, dry_run, retries, retry_delay, hints)
+        except Exception as exc:
+            logger.error("Move task raised unhandled exception for %s: %s", source, exc)
+
+    dir_devices: Dict[str, int] = {}
+    partitions: Dict[int, List[str]] = {}
+    for f in files:
+        parent = os.path.dirname(f)
+        dev = dir_devices.get(parent)
+        if dev is None:
+            dev = dir_devices[parent] = _device_id(parent)
+        partitions.setdefault(dev, []).append(f)
+
+    for dev, group in partitions.items():
+        workers = resolve_threads(threads, [Path(os.path.dirname(group[0])), destination_folder])
+        logger.info(
+            "Moving %d file(s) from device %d with %d worker(s) ...", len(group), dev, workers
+        )
+        thread_map(
+            _move, group,
+            max_workers=workers,
+            desc="Moving duplicates", unit="file", mininterval=PROGRESS_INTERVAL,
+        )
 
 
 # ---------------------------------------------------------------------------
@@ -394,8 +1153,15 @@ def move_files_in_parallel(
 
 def main() -> None:
     args = parse_args()
-    setup_logging(args.log_file, args.log_level)
+    listener = setup_logging(args.log_file, args.log_level)
+    try:
+        run(args)
+    finally:
+        listener.stop()                         # flush queued log records
+
 
+def run(args: argparse.Namespace) -> None:
+    """Execute a deduplication pass configured by parsed CLI *args*."""
     logger.info("=== Audio File Deduplication ===")
     logger.info("Reference  : %s", args.reference)
     logger.info("Source     : %s", args.source)
@@ -406,7 +1172,14 @@ def main() -> None:
         args.partial_hash_size,
         f"cap {args.max_hash_bytes}B" if args.max_hash_bytes else "full file",
     )
-    logger.info("Threads    : %d | Dry run: %s", args.threads, args.dry_run)
+    logger.info("Dry run    : %s", args.dry_run)
+    logger.info("Hash cache : %s", args.cache_file if args.use_cache else "disabled")
+
+    try:
+        new_hasher(args.hash_algorithm)
+    except ValueError as exc:
+        logger.error("Unsupported hash algorithm %r: %s", args.hash_algorithm, exc)
+        return
 
     # Validate that required paths were actually provided.
     for flag, val in (("--reference", args.reference), ("--source", args.source), ("--output", args.output)):
@@ -423,30 +1196,49 @@ def main() -> None:
 
     args.output.mkdir(parents=True, exist_ok=True)
 
+    hash_threads = resolve_threads(args.threads, [args.reference, args.source])
+
+    pin_cpus: Tuple[int, ...] = ()
+    if args.pin_cores:
+        if args.processes:
+            logger.warning("--pin-cores applies to thread workers only; ignored with --processes.")
+        else:
+            pin_cpus = tuple(physical_core_cpus())
+            if pin_cpus:
+                # One worker per physical core: SMT siblings share execution units.
+                hash_threads = min(hash_threads, len(pin_cpus))
+                logger.info("Pinning    : hash workers to CPUs %s", ", ".join(map(str, pin_cpus)))
+            else:
+                logger.warning("CPU topology unavailable — hashing threads are not pinned.")
+    logger.info(
+        "Workers    : hash=%d %s | move=%s",
+        hash_threads, "processes" if args.processes else "threads",
+        args.threads if args.threads > 0 else "auto per filesystem",
+    )
+
     if args.dry_run:
         logger.info("DRY RUN MODE — no files will be moved.")
 
-    logger.info("Scanning reference folder ...")
-    reference_files = find_audio_files(args.reference)
-
-    logger.info("Scanning source folder ...")
-    source_files = find_audio_files(args.source)
+    cache = HashCache(args.cache_file) if args.use_cache else None
 
-    if not reference_files:
-        logger.warning("Reference folder contains no audio files — nothing to compare against.")
-        return
-    if not source_files:
-        logger.warning("Source folder contains no audio files.")
-        return
-
-    duplicates = find_duplicates(
-        reference_files=reference_files,
-        source_files=source_files,
-        algorithm=args.hash_algorithm,
-        partial_hash_size=args.partial_hash_size,
-        max_hash_bytes=args.max_hash_bytes if args.max_hash_bytes else None,
-        threads=args.threads,
-    )
+    # Both scans stream straight into find_duplicates' size index.  The cache
+    # is saved even if hashing is interrupted, so finished stages are kept.
+    try:
+        duplicates = find_duplicates(
+            reference_files=scan_audio_files(args.reference, hash_threads),
+            source_files=scan_audio_files(args.source, hash_threads),
+            algorithm=args.hash_algorithm,
+            partial_hash_size=args.partial_hash_size,
+            max_hash_bytes=args.max_hash_bytes if args.max_hash_bytes else None,
+            threads=hash_threads,
+            cache=cache,
+            use_processes=args.processes,
+            pin_cpus=pin_cpus,
+            use_mmap=args.mmap,
+        )
+    finally:
+        if cache is not None:
+            cache.save()
 
     if duplicates:
         logger.info("Moving %d duplicate(s) to %s ...", len(duplicates), args.output)
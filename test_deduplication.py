@@ -8,25 +8,60 @@ Run with:
     pytest test_deduplication.py -v
 
 Coverage:
-  - compute_hash      : correct digest, partial reads, file-smaller-than-cap, missing file
-  - find_audio_files  : extensions, recursion, case-insensitivity, empty directory
+  - compute_hash      : correct digest, partial reads, file-smaller-than-cap, missing file,
+                        empty file, streamed reads by default, opt-in mmap
+                        and its fallback, fadvise hints,
+                        optional blake3 / xxhash backends
+  - compute_partial_hash : head + tail sampling, small files hashed whole
+  - find_audio_files  : extensions, recursion, case-insensitivity, empty directory,
+                        hidden dot-files, directory symlinks, reported sizes and mtimes,
+                        parallel walk
   - find_duplicates   : critical cross-folder regression, internal duplicates,
-                        multiple copies, no false positives, empty inputs
-  - move_file         : dry run, basic move, collision resolution, directory creation
+                        multiple copies, no false positives, empty inputs,
+                        streamed scan input, process-pool progress,
+                        reference folder nested inside the source folder
+  - move_file         : dry run, basic move, collision resolution, directory creation,
+                        released names reused within a batch
+  - move_files_in_parallel : all files moved, one failure does not abort the rest,
+                             per-filesystem worker counts
+  - HashCache         : round-trip persistence, invalidation on change, cache reuse,
+                        eviction of deleted files, malformed cache files,
+                        save on interrupted runs, signatures reused from the scan
+  - resolve_threads   : explicit override, HDD cap, SSD/unknown default
+  - setup_logging     : records reach the log file through the queue listener,
+                        including records from process-pool workers
+  - CPU pinning       : physical core detection, one pin per worker thread,
+                        single-threaded blake3 on pinned workers
 """
 
+import errno
 import hashlib
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler
 from pathlib import Path
 
 import pytest
 
 # The module no longer runs side-effects at import time (logging is deferred to
 # setup_logging() which is only called from main()), so this import is safe.
+import audio_deduplication
 from audio_deduplication import (
+    HashCache,
     compute_hash,
+    compute_partial_hash,
     find_audio_files,
+    new_hasher,
+    physical_core_cpus,
+    is_rotational,
+    resolve_threads,
     find_duplicates,
     move_file,
+    move_files_in_parallel,
+    scan_audio_files,
+    setup_logging,
 )
 
 
@@ -55,6 +90,38 @@ def make_file(directory: Path, name: str, content: bytes) -> Path:
     return path
 
 
+def as_int(hasher) -> int:
+    """Return *hasher*'s digest in the int form produced by compute_hash()."""
+    return int.from_bytes(hasher.digest(), "big")
+
+
+def with_sizes(paths) -> list:
+    """Return [(str(path), size, mtime_ns)] as produced by find_audio_files()."""
+    entries = []
+    for p in paths:
+        st = Path(p).stat()
+        entries.append((str(p), st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def run_find_duplicates(ref_files, src_files, **kwargs) -> list:
+    """Run find_duplicates() with the suite's defaults; *kwargs* override them."""
+    options = dict(algorithm="sha256", partial_hash_size=4096, max_hash_bytes=None, threads=2)
+    options.update(kwargs)
+    return find_duplicates(
+        reference_files=with_sizes(ref_files),
+        source_files=with_sizes(src_files),
+        **options,
+    )
+
+
+def fail_if_called(message: str):
+    """Return a stand-in that fails the test with *message* if it is ever called."""
+    def fail(*args, **kwargs):
+        raise AssertionError(message)
+    return fail
+
+
 # ---------------------------------------------------------------------------
 # compute_hash
 # ---------------------------------------------------------------------------
@@ -63,40 +130,106 @@ class TestComputeHash:
 
     def test_full_hash_known_value(self, tmp_path):
         f = make_file(tmp_path, "a.flac", b"hello world")
-        expected = hashlib.sha256(b"hello world").hexdigest()
+        expected = as_int(hashlib.sha256(b"hello world"))
         assert compute_hash(str(f), "sha256", None) == expected
 
     def test_partial_hash_reads_exactly_n_bytes(self, tmp_path):
         content = b"ABCDEFGHIJ" * 200          # 2000 bytes
         f = make_file(tmp_path, "a.mp3", content)
-        expected = hashlib.sha256(content[:10]).hexdigest()
+        expected = as_int(hashlib.sha256(content[:10]))
         assert compute_hash(str(f), "sha256", 10) == expected
 
     def test_partial_hash_larger_than_file_hashes_whole_file(self, tmp_path):
         """When max_bytes exceeds file size, the entire file must be hashed."""
         content = b"tiny"
         f = make_file(tmp_path, "a.wav", content)
-        expected = hashlib.sha256(content).hexdigest()
+        expected = as_int(hashlib.sha256(content))
         assert compute_hash(str(f), "sha256", 999_999) == expected
 
     def test_max_bytes_none_hashes_full_file(self, tmp_path):
         content = SAMPLE_A
         f = make_file(tmp_path, "a.ogg", content)
-        expected = hashlib.sha256(content).hexdigest()
+        expected = as_int(hashlib.sha256(content))
         assert compute_hash(str(f), "sha256", None) == expected
 
     def test_max_bytes_zero_hashes_full_file(self, tmp_path):
         """max_bytes=0 is treated as 'no cap' (same as None)."""
         content = SAMPLE_A
         f = make_file(tmp_path, "a.flac", content)
-        expected = hashlib.sha256(content).hexdigest()
+        expected = as_int(hashlib.sha256(content))
         assert compute_hash(str(f), "sha256", 0) == expected
 
+    def test_empty_file(self, tmp_path):
+        f = make_file(tmp_path, "empty.mp3", b"")
+        expected = as_int(hashlib.sha256(b""))
+        assert compute_hash(str(f), "sha256", None) == expected
+        assert compute_hash(str(f), "sha256", 4096) == expected
+
+    def test_unaligned_cap(self, tmp_path):
+        """Caps that are not page-aligned must still hash exactly max_bytes."""
+        content = bytes(range(256)) * 1000       # 256000 bytes
+        f = make_file(tmp_path, "big.flac", content)
+        expected = as_int(hashlib.sha256(content[:70001]))
+        assert compute_hash(str(f), "sha256", 70001) == expected
+
+    @pytest.mark.parametrize("error", [
+        OSError(19, "No such device"),                  # FUSE / network filesystems
+        OverflowError("mmap length is too large"),      # 32-bit address space
+    ])
+    @pytest.mark.parametrize("max_bytes", [None, 70001])
+    def test_stream_fallback_when_mmap_unsupported(self, tmp_path, monkeypatch, max_bytes, error):
+        content = bytes(range(256)) * 10000     # 2.56 MB — several stream blocks
+        f = make_file(tmp_path, "big.flac", content)
+        def no_mmap(*args, **kwargs):
+            raise error
+        monkeypatch.setattr(audio_deduplication.mmap, "mmap", no_mmap)
+        expected = as_int(hashlib.sha256(content[:max_bytes]))
+        assert compute_hash(str(f), "sha256", max_bytes, use_mmap=True) == expected
+
+    @pytest.mark.parametrize("max_bytes", [None, 70001])
+    def test_mmap_is_opt_in(self, tmp_path, monkeypatch, max_bytes):
+        """Streamed reads are the default: a mapped file truncated mid-hash
+        raises SIGBUS, which no try/except can contain."""
+        content = bytes(range(256)) * 10000
+        f = make_file(tmp_path, "big.flac", content)
+        expected = as_int(hashlib.sha256(content[:max_bytes]))
+        assert compute_hash(str(f), "sha256", max_bytes, use_mmap=True) == expected
+        monkeypatch.setattr(
+            audio_deduplication.mmap, "mmap", fail_if_called("mmap must be opt-in")
+        )
+        assert compute_hash(str(f), "sha256", max_bytes) == expected
+
+    def test_page_cache_hints_issued(self, tmp_path, monkeypatch):
+        if not hasattr(os, "posix_fadvise"):
+            pytest.skip("posix_fadvise not available on this platform")
+        calls = []
+        monkeypatch.setattr(os, "posix_fadvise", lambda fd, off, n, adv: calls.append((off, n, adv)))
+        f = make_file(tmp_path, "a.flac", SAMPLE_A)
+        assert compute_hash(str(f), "sha256", 1000) == as_int(hashlib.sha256(SAMPLE_A[:1000]))
+        assert calls == [
+            (0, 1000, os.POSIX_FADV_SEQUENTIAL),
+            (0, 0, os.POSIX_FADV_DONTNEED),
+        ]
+
     def test_md5_algorithm(self, tmp_path):
         f = make_file(tmp_path, "a.aac", b"test")
-        expected = hashlib.md5(b"test").hexdigest()
+        expected = as_int(hashlib.md5(b"test"))
         assert compute_hash(str(f), "md5", None) == expected
 
+    def test_blake3_algorithm(self, tmp_path):
+        blake3 = pytest.importorskip("blake3")
+        f = make_file(tmp_path, "a.flac", SAMPLE_A)
+        assert compute_hash(str(f), "blake3", None) == as_int(blake3.blake3(SAMPLE_A))
+
+    def test_xxh3_128_algorithm(self, tmp_path):
+        xxhash = pytest.importorskip("xxhash")
+        f = make_file(tmp_path, "a.flac", SAMPLE_A)
+        assert compute_hash(str(f), "xxh3_128", None) == as_int(xxhash.xxh3_128(SAMPLE_A))
+
+    def test_unknown_algorithm_rejected(self):
+        with pytest.raises(ValueError):
+            new_hasher("not-a-real-hash")
+
     def test_missing_file_returns_none(self, tmp_path):
         assert compute_hash(str(tmp_path / "ghost.mp3"), "sha256", None) is None
 
@@ -105,12 +238,47 @@ class TestComputeHash:
         f2 = make_file(tmp_path, "b.mp3", SAMPLE_B)
         assert compute_hash(str(f1), "sha256", None) != compute_hash(str(f2), "sha256", None)
 
+    def test_returns_int_digest(self, tmp_path):
+        f = make_file(tmp_path, "a.mp3", SAMPLE_A)
+        digest = compute_hash(str(f), "sha256", None)
+        assert isinstance(digest, int)
+        assert f"{digest:064x}" == hashlib.sha256(SAMPLE_A).hexdigest()
+
     def test_identical_content_same_hash(self, tmp_path):
         f1 = make_file(tmp_path, "a.mp3", SAMPLE_A)
         f2 = make_file(tmp_path, "c.mp3", SAMPLE_C)   # identical bytes
         assert compute_hash(str(f1), "sha256", None) == compute_hash(str(f2), "sha256", None)
 
 
+# ---------------------------------------------------------------------------
+# compute_partial_hash
+# ---------------------------------------------------------------------------
+
+class TestComputePartialHash:
+
+    def test_small_file_hashed_whole(self, tmp_path):
+        f = make_file(tmp_path, "a.mp3", b"0123456789")
+        expected = as_int(hashlib.sha256(b"0123456789"))
+        assert compute_partial_hash(str(f), "sha256", 5) == expected
+        assert compute_partial_hash(str(f), "sha256", 4096) == expected
+
+    def test_hashes_head_and_tail(self, tmp_path):
+        content = bytes(range(256)) * 40       # 10240 bytes
+        f = make_file(tmp_path, "a.flac", content)
+        expected = as_int(hashlib.sha256(content[:1024] + content[-1024:]))
+        assert compute_partial_hash(str(f), "sha256", 1024) == expected
+
+    def test_differing_tail_separates_shared_header(self, tmp_path):
+        header = b"ID3" + b"\x00" * 8000
+        f1 = make_file(tmp_path, "a.mp3", header + b"tail_one")
+        f2 = make_file(tmp_path, "b.mp3", header + b"tail_two")
+        assert compute_hash(str(f1), "sha256", 4096) == compute_hash(str(f2), "sha256", 4096)
+        assert compute_partial_hash(str(f1), "sha256", 4096) != compute_partial_hash(str(f2), "sha256", 4096)
+
+    def test_missing_file_returns_none(self, tmp_path):
+        assert compute_partial_hash(str(tmp_path / "ghost.mp3"), "sha256", 4096) is None
+
+
 # ---------------------------------------------------------------------------
 # find_audio_files
 # ---------------------------------------------------------------------------
@@ -122,7 +290,7 @@ class TestFindAudioFiles:
         make_file(tmp_path, "track.flac", b"x")
         make_file(tmp_path, "image.jpg",  b"x")   # must be ignored
         make_file(tmp_path, "notes.txt",  b"x")   # must be ignored
-        found = {Path(f).name for f in find_audio_files(tmp_path)}
+        found = {Path(f).name for f, *_ in find_audio_files(tmp_path)}
         assert "track.mp3"  in found
         assert "track.flac" in found
         assert "image.jpg"  not in found
@@ -132,7 +300,7 @@ class TestFindAudioFiles:
         sub = tmp_path / "deep" / "nested"
         make_file(sub, "nested.wav", b"x")
         found = find_audio_files(tmp_path)
-        assert any("nested.wav" in f for f in found)
+        assert any("nested.wav" in f for f, *_ in found)
 
     def test_empty_directory_returns_empty_list(self, tmp_path):
         assert find_audio_files(tmp_path) == []
@@ -142,12 +310,45 @@ class TestFindAudioFiles:
         make_file(tmp_path, "mixed.FLaC", b"x")
         assert len(find_audio_files(tmp_path)) == 2
 
+    def test_hidden_file_named_like_extension_ignored(self, tmp_path):
+        """'.mp3' has no suffix (matches Path.suffix semantics)."""
+        make_file(tmp_path, ".mp3", b"x")
+        assert find_audio_files(tmp_path) == []
+
+    def test_directory_symlinks_not_followed(self, tmp_path):
+        make_file(tmp_path / "real", "track.mp3", b"x")
+        try:
+            (tmp_path / "link").symlink_to(tmp_path / "real", target_is_directory=True)
+        except (OSError, NotImplementedError):
+            pytest.skip("symlinks not supported")
+        found = find_audio_files(tmp_path)
+        assert [(f, size) for f, size, _ in found] == [(str(tmp_path / "real" / "track.mp3"), 1)]
+
     def test_directories_not_included(self, tmp_path):
         """Subdirectory names that look like audio files must not be returned."""
         fake = tmp_path / "not_a_file.mp3"
         fake.mkdir()
         found = find_audio_files(tmp_path)
-        assert not any("not_a_file.mp3" in f for f in found)
+        assert not any("not_a_file.mp3" in f for f, *_ in found)
+
+    def test_parallel_walk_matches_sequential(self, tmp_path):
+        make_file(tmp_path, "root.mp3", b"r")
+        for i in range(6):
+            make_file(tmp_path / f"artist{i}" / "album", f"t{i}.flac", b"x" * i)
+        make_file(tmp_path / "artist0", "single.wav", b"s")
+        sequential = find_audio_files(tmp_path, threads=1)
+        parallel = find_audio_files(tmp_path, threads=4)
+        assert len(sequential) == 8
+        assert parallel == sequential
+
+    def test_returns_sizes_and_mtimes(self, tmp_path):
+        a = make_file(tmp_path, "a.mp3", SAMPLE_A)
+        d = make_file(tmp_path, "d.mp3", SAMPLE_D)
+        found = {f: (size, mtime_ns) for f, size, mtime_ns in find_audio_files(tmp_path)}
+        assert found == {
+            str(a): (len(SAMPLE_A), a.stat().st_mtime_ns),
+            str(d): (len(SAMPLE_D), d.stat().st_mtime_ns),
+        }
 
 
 # ---------------------------------------------------------------------------
@@ -158,15 +359,8 @@ class TestFindDuplicates:
     """These tests cover the 3-stage deduplication logic, including a regression
     guard for the critical cross-folder comparison bug in the original code."""
 
-    def _run(self, ref_files, src_files):
-        return find_duplicates(
-            reference_files=[str(f) for f in ref_files],
-            source_files=[str(f) for f in src_files],
-            algorithm="sha256",
-            partial_hash_size=4096,
-            max_hash_bytes=None,
-            threads=2,
-        )
+    def _run(self, ref_files, src_files, **kwargs):
+        return run_find_duplicates(ref_files, src_files, **kwargs)
 
     # ── REGRESSION GUARD — the critical original bug ─────────────────────────
 
@@ -250,6 +444,25 @@ class TestFindDuplicates:
         assert len(duplicates) == 2
         assert str(s1) not in duplicates
 
+    # ── Mixed groups ─────────────────────────────────────────────────────────
+
+    def test_several_reference_copies_only_sources_returned(self, tmp_path):
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        r1 = make_file(ref_dir, "r1.mp3", SAMPLE_A)
+        r2 = make_file(ref_dir, "r2.mp3", SAMPLE_C)
+        s1 = make_file(src_dir, "s1.mp3", SAMPLE_C)
+        s2 = make_file(src_dir, "s2.mp3", SAMPLE_A)
+        assert self._run([r1, r2], [s1, s2]) == [str(s1), str(s2)]
+
+    def test_reference_match_and_internal_duplicates_together(self, tmp_path):
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        ref = make_file(ref_dir, "a.mp3", SAMPLE_A)
+        a1  = make_file(src_dir, "a1.mp3", SAMPLE_C)
+        b1  = make_file(src_dir, "b1.mp3", SAMPLE_B)
+        b2  = make_file(src_dir, "b2.mp3", SAMPLE_B)
+        duplicates = self._run([ref], [a1, b1, b2])
+        assert sorted(duplicates) == sorted([str(a1), str(b2)])
+
     # ── Multiple source copies of the same reference file ─────────────────────
 
     def test_multiple_source_copies_all_flagged(self, tmp_path):
@@ -282,6 +495,112 @@ class TestFindDuplicates:
     def test_both_empty_returns_empty(self, tmp_path):
         assert self._run([], []) == []
 
+    # ── Reference-only size groups ────────────────────────────────────────────
+
+    def test_reference_only_size_group_not_hashed(self, tmp_path, monkeypatch):
+        """Same-size reference files with no source peer can never yield a move."""
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        r1 = make_file(ref_dir, "r1.mp3", SAMPLE_A)
+        r2 = make_file(ref_dir, "r2.mp3", SAMPLE_C)
+        s1 = make_file(src_dir, "s1.mp3", SAMPLE_D)   # unique size
+
+        hashed = []
+        def spy(path, algorithm, window):
+            hashed.append(path)
+            return 0
+        monkeypatch.setattr(audio_deduplication, "compute_partial_hash", spy)
+
+        assert self._run([r1, r2], [s1]) == []
+        assert hashed == []
+
+    def test_reference_only_partial_group_not_fully_hashed(self, tmp_path, monkeypatch):
+        """Two identical references plus a same-size but different source: the
+        source drops out in Stage 2 and the reference pair must not reach Stage 3."""
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        r1 = make_file(ref_dir, "r1.mp3", SAMPLE_A)
+        r2 = make_file(ref_dir, "r2.mp3", SAMPLE_C)
+        s1 = make_file(src_dir, "s1.mp3", SAMPLE_B)
+
+        monkeypatch.setattr(
+            audio_deduplication, "compute_hash",
+            fail_if_called("Stage 3 must not run for reference-only groups"),
+        )
+
+        assert self._run([r1, r2], [s1]) == []
+
+    # ── Overlapping folders ───────────────────────────────────────────────────
+
+    def test_reference_nested_inside_source(self, tmp_path):
+        """--source /music --reference /music/originals: the original is scanned
+        from both sides, and the scan may list it after the copy."""
+        src_dir = tmp_path / "music"
+        orig = make_file(src_dir / "originals", "orig.mp3", SAMPLE_A)
+        copy = make_file(src_dir, "copy.mp3", SAMPLE_C)
+
+        for source_order in ([copy, orig], [orig, copy]):
+            assert self._run([orig], source_order) == [str(copy)]
+
+    def test_file_scanned_from_both_sides_is_not_its_own_duplicate(self, tmp_path, monkeypatch):
+        """A nested original with no copy elsewhere must not even be hashed."""
+        src_dir = tmp_path / "music"
+        orig  = make_file(src_dir / "originals", "orig.mp3", SAMPLE_A)
+        other = make_file(src_dir, "other.mp3", SAMPLE_D)
+
+        monkeypatch.setattr(
+            audio_deduplication, "compute_partial_hash",
+            fail_if_called("a file must not be compared with itself"),
+        )
+
+        assert self._run([orig], [orig, other]) == []
+
+    # ── Streaming input ───────────────────────────────────────────────────────
+
+    def test_accepts_scan_generators(self, tmp_path):
+        """The scans can be streamed straight in; each is consumed once."""
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        make_file(ref_dir / "album", "original.mp3", SAMPLE_A)
+        make_file(src_dir / "x", "copy.mp3", SAMPLE_C)
+        make_file(src_dir / "y", "other.mp3", SAMPLE_B)
+
+        duplicates = find_duplicates(
+            reference_files=scan_audio_files(ref_dir, threads=2),
+            source_files=scan_audio_files(src_dir, threads=2),
+            algorithm="sha256",
+            partial_hash_size=4096,
+            max_hash_bytes=None,
+            threads=2,
+        )
+        assert duplicates == [str(src_dir / "x" / "copy.mp3")]
+
+    # ── Process pool ──────────────────────────────────────────────────────────
+
+    def test_process_pool_matches_thread_pool(self, tmp_path):
+        ref_dir = tmp_path / "ref"; src_dir = tmp_path / "src"
+        ref = make_file(ref_dir, "original.mp3", SAMPLE_A)
+        s1  = make_file(src_dir, "copy.mp3",     SAMPLE_C)
+        s2  = make_file(src_dir, "other.mp3",    SAMPLE_B)
+
+        assert self._run([ref], [s1, s2], use_processes=True) == [str(s1)]
+
+    def test_process_pool_progress_counts_every_file(self, tmp_path, monkeypatch):
+        bars = []
+        class SpyTqdm(audio_deduplication.tqdm):
+            def close(self):
+                bars.append((self.n, self.total))
+                super().close()
+        monkeypatch.setattr(audio_deduplication, "tqdm", SpyTqdm)
+
+        ref = make_file(tmp_path / "ref", "original.mp3", SAMPLE_A)
+        copies = [make_file(tmp_path / "src", f"copy{i}.mp3", SAMPLE_C) for i in range(5)]
+        duplicates = self._run([ref], copies, use_processes=True)
+        assert duplicates == [str(c) for c in copies]
+        assert bars and set(bars) == {(6, 6)}   # every stage's bar reached its total
+
+    def test_process_chunksize_scales_with_batch(self):
+        assert audio_deduplication.process_chunksize(10, 4) == 1
+        assert audio_deduplication.process_chunksize(320, 4) == 10
+        assert audio_deduplication.process_chunksize(100_000, 4) == audio_deduplication.PROCESS_CHUNKSIZE
+
     # ── Same-size but different content (partial hash separates them) ─────────
 
     def test_same_size_different_content_not_flagged(self, tmp_path):
@@ -340,3 +659,379 @@ class TestMoveFile:
         dest = tmp_path / "dest"
         move_file(str(src), dest, dry_run=False, retries=0, retry_delay=0)
         assert (dest / "file.wav").read_bytes() == payload
+
+    def test_cross_filesystem_copies_without_rename(self, tmp_path, monkeypatch):
+        src  = make_file(tmp_path / "src", "track.mp3", b"audio")
+        dest = tmp_path / "dest"
+        monkeypatch.setattr(audio_deduplication, "_same_filesystem", lambda a, b: False)
+        no_rename = fail_if_called("rename must not be attempted across filesystems")
+        monkeypatch.setattr(os, "rename", no_rename)
+        monkeypatch.setattr(os, "replace", no_rename)
+        move_file(str(src), dest, dry_run=False, retries=0, retry_delay=0)
+        assert (dest / "track.mp3").read_bytes() == b"audio"
+        assert not src.exists()
+
+    def test_exdev_rename_falls_back_to_copy(self, tmp_path, monkeypatch):
+        src  = make_file(tmp_path / "src", "track.mp3", b"audio")
+        dest = tmp_path / "dest"
+        def exdev(src, dst):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        monkeypatch.setattr(os, "replace", exdev)
+        move_file(str(src), dest, dry_run=False, retries=0, retry_delay=0)
+        assert (dest / "track.mp3").read_bytes() == b"audio"
+
+    def test_failed_move_is_retried_then_gives_up(self, tmp_path, monkeypatch):
+        src  = make_file(tmp_path / "src", "track.mp3", b"audio")
+        dest = tmp_path / "dest"
+        calls = []
+        def fail(src, dst):
+            calls.append(dst)
+            raise PermissionError(errno.EACCES, "locked")
+        monkeypatch.setattr(os, "replace", fail)
+        move_file(str(src), dest, dry_run=False, retries=2, retry_delay=0)
+        assert len(calls) == 3
+        assert src.exists()
+        assert list(dest.iterdir()) == [], "Reserved placeholder must be released"
+
+    def test_released_placeholder_name_is_reused(self, tmp_path, monkeypatch):
+        """A failed move must not leave the batch's hint past a free name."""
+        dest  = tmp_path / "dest"
+        first = make_file(tmp_path / "a", "track.mp3", b"first")
+        later = make_file(tmp_path / "b", "track.mp3", b"later")
+        hints = {}
+
+        real_replace = os.replace
+        def locked_first(src, dst):
+            if Path(src) == first:
+                raise PermissionError(errno.EACCES, "locked")
+            real_replace(src, dst)
+        monkeypatch.setattr(os, "replace", locked_first)
+
+        move_file(str(first), dest, dry_run=False, retries=0, retry_delay=0, hints=hints)
+        move_file(str(later), dest, dry_run=False, retries=0, retry_delay=0, hints=hints)
+        assert sorted(p.name for p in dest.iterdir()) == ["track.mp3"]
+        assert (dest / "track.mp3").read_bytes() == b"later"
+
+    def test_failed_cross_filesystem_delete_removes_copy(self, tmp_path, monkeypatch):
+        src  = make_file(tmp_path / "src", "track.mp3", b"audio")
+        dest = tmp_path / "dest"
+        monkeypatch.setattr(audio_deduplication, "_same_filesystem", lambda a, b: False)
+        real_unlink = os.unlink
+        def locked_source(path, *args, **kwargs):
+            if Path(path) == src:
+                raise PermissionError(errno.EACCES, "locked")
+            real_unlink(path, *args, **kwargs)
+        monkeypatch.setattr(os, "unlink", locked_source)
+        move_file(str(src), dest, dry_run=False, retries=0, retry_delay=0)
+        assert src.read_bytes() == b"audio"
+        assert list(dest.iterdir()) == [], "Copy of an undeleted source must be removed"
+
+    def test_dry_run_reports_collision_name_without_placeholder(self, tmp_path, caplog):
+        src      = make_file(tmp_path / "src", "track.mp3", b"new")
+        dest_dir = tmp_path / "dest"; dest_dir.mkdir()
+        (dest_dir / "track.mp3").write_bytes(b"existing")
+        with caplog.at_level("INFO"):
+            move_file(str(src), dest_dir, dry_run=True, retries=0, retry_delay=0)
+        assert "track_1.mp3" in caplog.text
+        assert sorted(p.name for p in dest_dir.iterdir()) == ["track.mp3"]
+
+    def test_parallel_same_name_moves_do_not_overwrite(self, tmp_path):
+        """Many workers moving same-named files must each get a distinct target."""
+        dest_dir = tmp_path / "dest"
+        sources = [
+            make_file(tmp_path / f"src{i}", "track.mp3", f"payload {i}".encode())
+            for i in range(20)
+        ]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(
+                lambda p: move_file(str(p), dest_dir, dry_run=False, retries=0, retry_delay=0),
+                sources,
+            ))
+        contents = sorted(p.read_bytes() for p in dest_dir.iterdir())
+        assert contents == sorted(f"payload {i}".encode() for i in range(20))
+
+
+# ---------------------------------------------------------------------------
+# move_files_in_parallel
+# ---------------------------------------------------------------------------
+
+class TestMoveFilesInParallel:
+
+    def test_moves_every_file(self, tmp_path):
+        sources = [make_file(tmp_path / "src", f"t{i}.mp3", b"x") for i in range(10)]
+        dest = tmp_path / "dest"
+        move_files_in_parallel([str(p) for p in sources], dest, False, 0, 0, threads=4)
+        assert sorted(p.name for p in dest.iterdir()) == sorted(p.name for p in sources)
+
+    def test_unexpected_error_does_not_abort_batch(self, tmp_path, monkeypatch):
+        sources = [make_file(tmp_path / "src", f"t{i}.mp3", b"x") for i in range(4)]
+        dest = tmp_path / "dest"
+        real_move = audio_deduplication.move_file
+        def flaky(source, *args):
+            if source.endswith("t1.mp3"):
+                raise RuntimeError("boom")
+            real_move(source, *args)
+        monkeypatch.setattr(audio_deduplication, "move_file", flaky)
+        move_files_in_parallel([str(p) for p in sources], dest, False, 0, 0, threads=2)
+        assert sorted(p.name for p in dest.iterdir()) == ["t0.mp3", "t2.mp3", "t3.mp3"]
+
+    def test_partitions_by_filesystem_with_own_worker_count(self, tmp_path, monkeypatch):
+        """Auto mode: an HDD-backed source partition moves serially, others in parallel."""
+        hdd = [make_file(tmp_path / "hdd", f"h{i}.mp3", b"x") for i in range(3)]
+        ssd = [make_file(tmp_path / "ssd", f"s{i}.mp3", b"x") for i in range(3)]
+        dest = tmp_path / "dest"
+
+        monkeypatch.setattr(
+            audio_deduplication, "_device_id", lambda d: 1 if d.endswith("hdd") else 2
+        )
+        monkeypatch.setattr(
+            audio_deduplication, "is_rotational", lambda p: Path(p).name == "hdd"
+        )
+        workers = {}
+        real_thread_map = audio_deduplication.thread_map
+        def spy(fn, items, **kwargs):
+            workers[Path(items[0]).parent.name] = kwargs["max_workers"]
+            return real_thread_map(fn, items, **kwargs)
+        monkeypatch.setattr(audio_deduplication, "thread_map", spy)
+
+        move_files_in_parallel([str(p) for p in hdd + ssd], dest, False, 0, 0, threads=0)
+
+        assert workers["hdd"] == 1
+        assert workers["ssd"] == min(os.cpu_count() or 1, audio_deduplication.MAX_AUTO_THREADS)
+        assert len(list(dest.iterdir())) == 6
+
+
+# ---------------------------------------------------------------------------
+# HashCache
+# ---------------------------------------------------------------------------
+
+class TestHashCache:
+
+    def _signature(self, path: Path):
+        st = path.stat()
+        return st.st_size, st.st_mtime_ns
+
+    def test_round_trip_persists_entries(self, tmp_path):
+        f = make_file(tmp_path, "a.mp3", SAMPLE_A)
+        cache_file = tmp_path / "cache.json"
+        key = HashCache.key(str(f), "sha256", None)
+
+        cache = HashCache(cache_file)
+        cache.put(key, self._signature(f), 0xABC123)
+        cache.save()
+
+        reloaded = HashCache(cache_file)
+        assert reloaded.get(key, self._signature(f)) == 0xABC123
+
+    def test_changed_signature_misses(self, tmp_path):
+        f = make_file(tmp_path, "a.mp3", SAMPLE_A)
+        cache = HashCache(tmp_path / "cache.json")
+        key = HashCache.key(str(f), "sha256", None)
+        size, mtime_ns = self._signature(f)
+        cache.put(key, (size, mtime_ns), 0xABC123)
+        assert cache.get(key, (size + 1, mtime_ns)) is None
+        assert cache.get(key, (size, mtime_ns + 1)) is None
+
+    def test_key_distinguishes_algorithm_and_cap(self, tmp_path):
+        path = str(tmp_path / "a.mp3")
+        assert HashCache.key(path, "sha256", None) != HashCache.key(path, "md5", None)
+        assert HashCache.key(path, "sha256", None) != HashCache.key(path, "sha256", 4096)
+        assert HashCache.key(path, "sha256", None) == HashCache.key(path, "sha256", 0)
+        assert HashCache.key(path, "sha256", 4096) != HashCache.key(path, "sha256", 4096, partial=True)
+
+    def test_save_evicts_entries_for_deleted_files(self, tmp_path):
+        kept = make_file(tmp_path, "kept.mp3", SAMPLE_A)
+        gone = make_file(tmp_path, "gone.mp3", SAMPLE_B)
+        cache_file = tmp_path / "cache.json"
+        kept_key = HashCache.key(str(kept), "sha256", None)
+        gone_key = HashCache.key(str(gone), "sha256", None)
+
+        cache = HashCache(cache_file)
+        cache.put(kept_key, self._signature(kept), 1)
+        cache.put(gone_key, self._signature(gone), 2)
+        cache.save()
+        gone.unlink()
+
+        # A later run that touches neither entry still prunes the deleted file.
+        HashCache(cache_file).save()
+        reloaded = HashCache(cache_file)
+        assert reloaded.get(kept_key, self._signature(kept)) == 1
+        assert gone_key not in reloaded._entries
+
+    def test_run_saves_cache_when_interrupted(self, tmp_path, monkeypatch):
+        """Digests from finished stages survive a Ctrl-C during a later one."""
+        f = make_file(tmp_path / "src", "a.mp3", SAMPLE_A)
+        (tmp_path / "ref").mkdir()
+        cache_file = tmp_path / "cache.json"
+        key = HashCache.key(str(f), "sha256", 4096, partial=True)
+
+        def interrupted(**kwargs):
+            kwargs["cache"].put(key, self._signature(f), 0xABC123)
+            raise KeyboardInterrupt
+        monkeypatch.setattr(audio_deduplication, "find_duplicates", interrupted)
+        monkeypatch.setattr(sys, "argv", [
+            "audio_deduplication.py",
+            "--reference", str(tmp_path / "ref"), "--source", str(tmp_path / "src"),
+            "--output", str(tmp_path / "out"), "--cache-file", str(cache_file),
+            "--hash-algorithm", "sha256",
+        ])
+
+        with pytest.raises(KeyboardInterrupt):
+            audio_deduplication.run(audio_deduplication.parse_args())
+        assert HashCache(cache_file).get(key, self._signature(f)) == 0xABC123
+
+    @pytest.mark.parametrize("content", [
+        "{not json",
+        "[]",
+        '{"version": 3, "entries": []}',
+        '{"version": 3, "entries": {"x": 1}}',
+        '{"version": 3, "entries": {"sha256:full0:/a.mp3": [1, 2]}}',
+    ])
+    def test_corrupt_cache_file_is_ignored(self, tmp_path, content):
+        cache_file = tmp_path / "cache.json"
+        cache_file.write_text(content)
+        cache = HashCache(cache_file)
+        assert cache.get("anything", (1, 1)) is None
+        cache.save()                            # must not trip over the bad entries
+
+    def test_find_duplicates_reuses_cached_digests(self, tmp_path, monkeypatch):
+        """A second run with an unchanged tree must not hash anything."""
+        ref = make_file(tmp_path / "ref", "a.mp3", SAMPLE_A)
+        src = make_file(tmp_path / "src", "b.mp3", SAMPLE_C)
+        cache_file = tmp_path / "cache.json"
+
+        cache = HashCache(cache_file)
+        assert run_find_duplicates([ref], [src], cache=cache) == [str(src)]
+        cache.save()
+
+        monkeypatch.setattr(
+            audio_deduplication, "compute_hash",
+            fail_if_called("compute_hash must not be called on a warm cache"),
+        )
+        assert run_find_duplicates([ref], [src], cache=HashCache(cache_file)) == [str(src)]
+
+    def test_cache_signatures_come_from_the_scan(self, tmp_path, monkeypatch):
+        """The scan's stat() already has size and mtime; candidates are not re-stat'ed."""
+        ref = make_file(tmp_path / "ref", "a.mp3", SAMPLE_A)
+        src = make_file(tmp_path / "src", "b.mp3", SAMPLE_C)
+        monkeypatch.setattr(
+            audio_deduplication, "_file_signature",
+            fail_if_called("candidates must not be stat'ed again"),
+        )
+        cache = HashCache(tmp_path / "cache.json")
+        assert run_find_duplicates([ref], [src], cache=cache) == [str(src)]
+        key = HashCache.key(str(src), "sha256", None)
+        assert cache.get(key, self._signature(src)) is not None
+
+
+# ---------------------------------------------------------------------------
+# resolve_threads
+# ---------------------------------------------------------------------------
+
+class TestResolveThreads:
+
+    def test_explicit_count_wins(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(audio_deduplication, "is_rotational", lambda p: True)
+        assert resolve_threads(5, [tmp_path]) == 5
+
+    def test_rotational_caps_at_one(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            audio_deduplication, "is_rotational", lambda p: p == tmp_path / "hdd"
+        )
+        assert resolve_threads(0, [tmp_path / "ssd", tmp_path / "hdd"]) == 1
+
+    @pytest.mark.parametrize("flag", [False, None])
+    def test_solid_state_or_unknown_uses_cpus(self, tmp_path, monkeypatch, flag):
+        monkeypatch.setattr(audio_deduplication, "is_rotational", lambda p: flag)
+        expected = min(os.cpu_count() or 1, audio_deduplication.MAX_AUTO_THREADS)
+        assert resolve_threads(0, [tmp_path]) == expected
+
+    def test_is_rotational_never_raises(self, tmp_path):
+        assert is_rotational(tmp_path) in (True, False, None)
+        assert is_rotational(tmp_path / "missing") is None
+
+
+# ---------------------------------------------------------------------------
+# setup_logging
+# ---------------------------------------------------------------------------
+
+class TestSetupLogging:
+
+    def test_records_written_via_queue_listener(self, tmp_path):
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        log_file = tmp_path / "dedup.log"
+        try:
+            listener = setup_logging(log_file, "INFO")
+            assert [type(h) for h in root.handlers] == [QueueHandler]
+            logging.getLogger("audio_deduplication").info("queued %s", "message")
+            listener.stop()
+        finally:
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+        assert "INFO - queued message" in log_file.read_text(encoding="utf-8")
+
+    def test_process_worker_errors_reach_log_file(self, tmp_path):
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        log_file = tmp_path / "dedup.log"
+        missing = tmp_path / "missing.mp3"
+        try:
+            listener = setup_logging(log_file, "INFO")
+            digests = audio_deduplication._hash_pool(
+                [str(missing)], "sha256", None, 2, "Hashing", use_processes=True,
+            )
+            listener.stop()
+        finally:
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+        assert digests == {}
+        assert f"Error hashing {missing}" in log_file.read_text(encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# CPU pinning
+# ---------------------------------------------------------------------------
+
+class TestCpuPinning:
+
+    def test_physical_core_cpus_subset_of_affinity(self):
+        cpus = physical_core_cpus()
+        if not hasattr(os, "sched_getaffinity"):
+            assert cpus == []
+        else:
+            assert set(cpus) <= os.sched_getaffinity(0)
+            assert cpus == sorted(set(cpus))
+
+    def test_workers_pinned_once_not_per_file(self, tmp_path, monkeypatch):
+        if not hasattr(os, "sched_setaffinity"):
+            pytest.skip("sched_setaffinity not available on this platform")
+        pins = []
+        monkeypatch.setattr(
+            os, "sched_setaffinity",
+            lambda pid, cpus: pins.append((pid, frozenset(cpus))),
+        )
+        ref = make_file(tmp_path / "ref", "a.mp3", SAMPLE_A)
+        srcs = [make_file(tmp_path / "src", f"s{i}.mp3", SAMPLE_C) for i in range(6)]
+
+        duplicates = run_find_duplicates([ref], srcs, pin_cpus=(0, 1))
+        assert len(duplicates) == 6
+        # Two hashing stages with at most two workers each; 7 files per stage
+        # means pinning happens per worker thread, not per file.
+        assert 1 <= len(pins) <= 4
+        assert all(cpus in ({0}, {1}) for _, cpus in pins)
+
+    def test_pinned_workers_use_single_threaded_blake3(self, monkeypatch):
+        created = []
+        class FakeBlake3:
+            AUTO = -1
+            def __init__(self, max_threads=1):
+                created.append(max_threads)
+        monkeypatch.setattr(audio_deduplication, "blake3", type("mod", (), {"blake3": FakeBlake3}))
+        monkeypatch.setattr(os, "sched_setaffinity", lambda pid, cpus: None, raising=False)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(new_hasher, "blake3").result()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(audio_deduplication._pinned_call, (0,), new_hasher, "blake3").result()
+        assert created == [FakeBlake3.AUTO, 1]